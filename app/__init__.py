@@ -1,18 +1,22 @@
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import os
-from flask import Flask, jsonify, current_app
-from flask_jwt_extended import JWTManager
+import queue
+import threading
+from typing import Any, Optional
+import orjson
+from flask import Flask, Response, jsonify, current_app
+from flask.json.provider import JSONProvider
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from flask_marshmallow import Marshmallow
 from flask_cors import CORS
 from config import Config
+from .jwt_cache import CachingJWTManager
 from openai import OpenAI
 from google import genai
 
-jwt = JWTManager()
-ma = Marshmallow()
+jwt = CachingJWTManager()
 cors = CORS()
 limiter = Limiter(key_func=get_remote_address)
 
@@ -22,32 +26,143 @@ deepseek_client = None
 gemini_client = None
 
 
+class ORJSONProvider(JSONProvider):
+    """JSON provider backed by orjson for faster request parsing and response encoding."""
+
+    _OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj, option=self._OPTIONS).decode()
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        """Builds jsonify() responses straight from orjson's bytes, skipping the str round-trip."""
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, option=self._OPTIONS), mimetype="application/json")
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves message and traceback formatting to the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The queue never leaves this process, so the record can be passed through as-is.
+        return record
+
+
+class BufferedRotatingFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler that buffers writes and flushes them on a timer.
+
+    Records at ERROR or above are flushed immediately.
+    """
+
+    def __init__(self, *args, flush_interval: float = 1.0, **kwargs):
+        self.flush_interval = flush_interval
+        self._flush_timer: Optional[threading.Timer] = None
+        super().__init__(*args, **kwargs)
+
+    def _open(self):
+        return open(self.baseFilename, self.mode, buffering=64 * 1024,
+                    encoding=self.encoding, errors=self.errors)
+
+    def emit(self, record):
+        super().emit(record)
+        if record.levelno >= logging.ERROR:
+            self.flush_now()
+
+    def flush(self):
+        """Schedules a flush instead of writing through on every record."""
+        self.acquire()
+        try:
+            if self._flush_timer is None or not self._flush_timer.is_alive():
+                self._flush_timer = threading.Timer(self.flush_interval, self.flush_now)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+        finally:
+            self.release()
+
+    def flush_now(self):
+        """Writes buffered records to the file immediately."""
+        self.acquire()
+        try:
+            self._flush_timer = None
+            super().flush()
+        finally:
+            self.release()
+
+
+def _start_log_listener(app: Flask) -> None:
+    log_queue = queue.SimpleQueue()
+    app.logger.handlers = [DeferredQueueHandler(log_queue)]
+    # app.* module loggers reach the queue through app.logger; stopping here keeps root
+    # from handling the same records again.
+    app.logger.propagate = False
+    # Other libraries log through root: their warnings and errors use the same queue.
+    root_handler = DeferredQueueHandler(log_queue)
+    root_handler.setLevel(logging.WARNING)
+    root_logger = logging.getLogger()
+    root_logger.handlers = [
+        handler for handler in root_logger.handlers if not isinstance(handler, DeferredQueueHandler)
+    ] + [root_handler]
+    listener = QueueListener(log_queue, *app.extensions['log_handlers'], respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    app.extensions['log_listener'] = listener
+
+
+def stop_log_listener(app: Flask) -> None:
+    """Drains the log queue and flushes the handlers, so no buffered output is inherited by a fork."""
+    listener = app.extensions.get('log_listener')
+    if listener is None:
+        return
+    atexit.unregister(listener.stop)
+    listener.stop()
+    app.extensions['log_listener'] = None
+    for handler in app.extensions['log_handlers']:
+        if isinstance(handler, BufferedRotatingFileHandler):
+            handler.flush_now()
+        else:
+            handler.flush()
+
+
+def restart_log_listener(app: Flask) -> None:
+    """Starts a new log listener in a forked worker, where the parent's listener thread no longer runs."""
+    if 'log_handlers' not in app.extensions:
+        return
+    _start_log_listener(app)
+
+
 def create_app():
     """Create and configure the Flask application."""
     
     app = Flask(__name__)
     app.config.from_object(Config)
+    app.json = ORJSONProvider(app)
     
     if not app.debug and not app.testing:
         os.makedirs("logs", exist_ok=True)
         formatter = logging.Formatter(
             '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
         )
-        file_handler = RotatingFileHandler('logs/app.log', maxBytes=10240, backupCount=10)
+        file_handler = BufferedRotatingFileHandler('logs/app.log', maxBytes=10 * 1024 * 1024, backupCount=10)
         file_handler.setFormatter(formatter)
         file_handler.setLevel(logging.INFO)
         stream_handler = logging.StreamHandler()
         stream_handler.setFormatter(formatter)
         stream_handler.setLevel(logging.INFO)
-        app.logger.addHandler(file_handler)
-        app.logger.addHandler(stream_handler)
+
+        # Requests only enqueue records; a background listener does the actual I/O.
+        app.extensions['log_handlers'] = (file_handler, stream_handler)
+        _start_log_listener(app)
         app.logger.setLevel(logging.INFO)
+        logging.raiseExceptions = False
         app.logger.info('Application startup')
 
     jwt.init_app(app)
-    ma.init_app(app)
     limiter.init_app(app)
-    cors.init_app(app, origins="*")
+    cors.init_app(app, origins=sorted(app.config['CORS_ORIGINS']) or "*")
 
     with app.app_context():
         global gemini_client, openai_client, deepseek_client
@@ -78,7 +193,9 @@ def create_app():
 
 
     from .auth import auth_bp
-    from .api import api_bp
+    from .api import api_bp, load_config
+
+    load_config(app)
     
     app.register_blueprint(auth_bp)
     app.register_blueprint(api_bp)
@@ -1,49 +1,103 @@
-import logging
+import threading
 import numpy as np
-from typing import Tuple, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from typing import Any, Dict, List, Tuple, Optional, get_args
 
-from flask import request, jsonify, Blueprint, current_app, Response
+from cachetools import TTLCache
+from flask import Flask, request, jsonify, Blueprint, current_app, Response
 from flask_jwt_extended import jwt_required
-from marshmallow import ValidationError
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.cluster import AgglomerativeClustering
+from pydantic import ValidationError
 
 from .helpers import (
-    fetch_questions_from_url, clean_html, get_embeddings,
-    verify_matches_with_llm, AIServiceUnavailableError
+    fetch_questions_from_url, clean_html, clean_html_many, get_embeddings,
+    verify_matches_with_llm, verify_groups_with_llm, AIServiceUnavailableError
 )
-from .schemas import SimilarityCheckSchema, GroupingSchema
-from . import limiter
+from .clustering import cluster_labels
+from .schemas import (
+    SimilarityCheckSchema, GroupingSchema, EmbeddingProvider, ReasoningProvider, validation_messages
+)
+from . import limiter, rate_limit, sim_cache
 
 api_bp = Blueprint('api', __name__)
-similarity_schema = SimilarityCheckSchema()
-grouping_schema = GroupingSchema()
+
+# Embeds a request's new question while its existing questions' matrix is looked up or built.
+_io_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='api-io')
+
+# Rows scored per step when a similarity check asks to stop at the first verified match.
+SHORT_CIRCUIT_BLOCK_ROWS = 256
+
+# Health probes get a pre-serialized body rather than going through jsonify.
+_HEALTH_BODY = b'{"status":"api_healthy"}'
+
+_get_question = itemgetter('Question')
+
+# (url, content version, providers, models, threshold) -> verified groups, so repeat
+# requests for an unchanged question list skip embedding, clustering and verification.
+_group_cache: TTLCache = TTLCache(maxsize=512, ttl=3600)
+_group_cache_lock = threading.Lock()
+
+# (url, content version, providers, models, threshold, short_circuit, exact_text_key(question))
+# -> similarity result, so resubmitting the same question skips embedding and verification.
+# Keyed on the exact normalized text: only a question the reasoning model has already
+# judged reuses its answer. The version covers the whole response body, so a changed ID
+# or other field of a matched question is never served from an older result.
+_similarity_cache: TTLCache = TTLCache(maxsize=4096, ttl=3600)
+_similarity_cache_lock = threading.Lock()
 
 
 JsonResponse = Tuple[Response, int]
 
+def load_config(app: Flask) -> None:
+    """
+    Resolves model names and tuning values from the app config once at startup.
+
+    They are stored in app.extensions so handlers avoid per-request config lookups and casts.
+    """
+    config = app.config
+    lookup: Dict[Tuple[str, str], Optional[str]] = {}
+    for provider_type, providers in (('embedding', EmbeddingProvider), ('reasoning', ReasoningProvider)):
+        for provider_name in get_args(providers):
+            model_name = config.get(f"{provider_name.upper()}_{provider_type.upper()}_MODEL")
+            lookup[(provider_type, provider_name)] = str(model_name) if model_name else None
+
+    app.extensions['model_map'] = lookup
+    # float32 to match the embedding scores it is compared against.
+    app.extensions['similarity_threshold'] = np.float32(config['SIMILARITY_THRESHOLD'])
+    app.extensions['cluster_graph_min_size'] = int(config['CLUSTER_GRAPH_MIN_SIZE'])
+    rate_limit.configure(float(config['PROVIDER_REQUESTS_PER_SECOND']), int(config['PROVIDER_REQUEST_BURST']))
+
+def _question_texts(questions: List[Dict[str, Any]]) -> List[str]:
+    """Raw 'Question' field of each item, '' when absent, keeping list positions aligned."""
+    return [_get_question(q) if 'Question' in q else '' for q in questions]
+
+def _grouping_response(verified_groups: List[List[Dict[str, Any]]]) -> JsonResponse:
+    if verified_groups:
+        return jsonify({"response": "yes", "matched_groups": verified_groups}), 200
+    return jsonify({"response": "no"}), 200
+
 def get_model_from_provider(provider_type: str, provider_name: str) -> Optional[str]:
     """Looks up the configured model name for a given provider."""
-    key = f"{provider_name.upper()}_{provider_type.upper()}_MODEL"
-    model_name = current_app.config.get(key)
-    return str(model_name) if model_name else None
+    return current_app.extensions['model_map'].get((provider_type, provider_name))
 
 @api_bp.route('/health', methods=['GET'])
-def health_check() -> JsonResponse:
+@limiter.exempt
+def health_check() -> Response:
     """Provides a simple health check endpoint."""
-    return jsonify({"status": "api_healthy"}), 200
+    return Response(_HEALTH_BODY, status=200, mimetype='application/json')
 
 @api_bp.route('/check_similarity', methods=['POST'])
 @jwt_required()
 def check_similarity() -> JsonResponse:
     """Checks a new question for similarity against a list of existing questions."""
     try:
-        data: Dict[str, Any] = similarity_schema.load(request.get_json())
+        data = SimilarityCheckSchema.model_validate_json(request.get_data(cache=False))
     except ValidationError as err:
-        return jsonify(err.messages), 400
+        return jsonify(validation_messages(err)), 400
 
-    embedding_provider = data['embedding_provider']
-    reasoning_provider = data['reasoning_provider']
+    questions_url = str(data.questions_url)
+    embedding_provider = data.embedding_provider
+    reasoning_provider = data.reasoning_provider
 
     embedding_model = get_model_from_provider('embedding', embedding_provider)
     reasoning_model = get_model_from_provider('reasoning', reasoning_provider)
@@ -52,49 +106,77 @@ def check_similarity() -> JsonResponse:
         return jsonify({"error": "Server configuration error: model name not found for a specified provider."}), 500
 
     try:
-        existing_questions = fetch_questions_from_url(data['questions_url'])
+        existing_questions, version = fetch_questions_from_url(questions_url)
         if existing_questions is None:
             return jsonify({"error": "Resource not found at URL or could not be parsed."}), 404
         if not existing_questions:
             return jsonify({"response": "no", "reason": "No existing questions to compare against."}), 200
-        
-        existing_questions_text = [clean_html(q.get('Question', '')) for q in existing_questions]
-        all_texts = [data['question']] + existing_questions_text
-        
-        embeddings = get_embeddings(all_texts, provider=embedding_provider, model_name=embedding_model)
-        if not embeddings:
+
+        question_key = sim_cache.exact_text_key(clean_html(data.question))
+        similarity_threshold = current_app.extensions['similarity_threshold']
+        cache_key = (
+            questions_url, version, embedding_provider, embedding_model, reasoning_provider,
+            reasoning_model, float(similarity_threshold), data.short_circuit, question_key
+        )
+        with _similarity_cache_lock:
+            cached_result = _similarity_cache.get(cache_key)
+        if cached_result is not None:
+            return jsonify(cached_result), 200
+
+        existing_questions_text = clean_html_many(_question_texts(existing_questions))
+        content_digest = sim_cache.content_digest(existing_questions_text)
+
+        exact_lookup = sim_cache.get_exact_lookup(questions_url, existing_questions_text, content_digest)
+        exact_match = exact_lookup.get(question_key)
+        if exact_match is not None:
+            return jsonify({"response": "yes", "matched_questions": [existing_questions[exact_match]]}), 200
+
+        # Only now is the new question's embedding needed; request it while the
+        # existing questions' matrix is looked up or built.
+        new_q_future = _io_executor.submit(
+            get_embeddings, [data.question], embedding_provider, embedding_model
+        )
+        existing_matrix = sim_cache.get_normalized_matrix(
+            questions_url, existing_questions_text, content_digest, embedding_provider, embedding_model,
+            lambda texts: get_embeddings(texts, provider=embedding_provider, model_name=embedding_model)
+        )
+        new_q_unit = new_q_future.result()[0]
+        if not new_q_unit.any():
             return jsonify({"error": "Failed to generate embeddings."}), 500
 
-        new_q_embedding = np.array([embeddings[0]])
-        existing_q_embeddings = np.array(embeddings[1:])
-        similarities = cosine_similarity(new_q_embedding, existing_q_embeddings)[0]
+        if data.short_circuit:
+            score_blocks = sim_cache.iter_scores(existing_matrix, new_q_unit, SHORT_CIRCUIT_BLOCK_ROWS)
+        else:
+            score_blocks = [(0, sim_cache.score(existing_matrix, new_q_unit))]
+
+        result: Dict[str, Any] = {"response": "no"}
+        for start, similarities in score_blocks:
+            matched_candidates = [
+                existing_questions[start + i]
+                for i in np.flatnonzero(similarities >= similarity_threshold).tolist()
+            ]
+            if not matched_candidates:
+                continue
 
-        threshold = float(current_app.config['SIMILARITY_THRESHOLD'])
-        
-        matched_candidates = [
-            existing_questions[i] for i, score in enumerate(similarities) if score >= threshold
-        ]
-        
-        if matched_candidates:
             verified_matches = verify_matches_with_llm(
-                ref_question=data['question'],
+                ref_question=data.question,
                 candidates=matched_candidates,
                 provider=reasoning_provider,
                 model_name=reasoning_model,
                 task_type='similarity'
             )
-            
             if verified_matches:
-                return jsonify({"response": "yes", "matched_questions": verified_matches}), 200
-            else:
-                return jsonify({"response": "no"}), 200
-        else:
-            return jsonify({"response": "no"}), 200
+                result = {"response": "yes", "matched_questions": verified_matches}
+                break
+
+        with _similarity_cache_lock:
+            _similarity_cache[cache_key] = result
+        return jsonify(result), 200
 
     except AIServiceUnavailableError as e:
         return jsonify({"error": str(e)}), 503
     except Exception:
-        logging.error("An unexpected error occurred in check_similarity", exc_info=True)
+        current_app.logger.error("An unexpected error occurred in check_similarity", exc_info=True)
         return jsonify({"error": "An internal server error occurred."}), 500
 
 
@@ -103,12 +185,13 @@ def check_similarity() -> JsonResponse:
 def group_similar_questions() -> JsonResponse:
     """Groups a list of questions by semantic similarity with double verification."""
     try:
-        data: Dict[str, Any] = grouping_schema.load(request.get_json())
+        data = GroupingSchema.model_validate_json(request.get_data(cache=False))
     except ValidationError as err:
-        return jsonify(err.messages), 400
+        return jsonify(validation_messages(err)), 400
 
-    embedding_provider = data['embedding_provider']
-    reasoning_provider = data['reasoning_provider']
+    questions_url = str(data.questions_url)
+    embedding_provider = data.embedding_provider
+    reasoning_provider = data.reasoning_provider
 
     embedding_model = get_model_from_provider('embedding', embedding_provider)
     reasoning_model = get_model_from_provider('reasoning', reasoning_provider)
@@ -117,55 +200,55 @@ def group_similar_questions() -> JsonResponse:
         return jsonify({"error": "Server configuration error: model name not found for the specified provider."}), 500
 
     try:
-        questions = fetch_questions_from_url(data['questions_url'])
+        questions, version = fetch_questions_from_url(questions_url)
         if not questions or len(questions) < 2:
             return jsonify({"response": "no", "reason": "Not enough questions to form a group."}), 200
 
-        questions_text = [clean_html(q.get('Question', '')) for q in questions]
+        similarity_threshold = current_app.extensions['similarity_threshold']
+        cache_key = (
+            questions_url, version, embedding_provider, embedding_model,
+            reasoning_provider, reasoning_model, similarity_threshold
+        )
+        with _group_cache_lock:
+            cached_groups = _group_cache.get(cache_key)
+        if cached_groups is not None:
+            return _grouping_response(cached_groups)
+
+        questions_text = clean_html_many(_question_texts(questions))
         embeddings = get_embeddings(questions_text, provider=embedding_provider, model_name=embedding_model)
 
-        if not embeddings:
+        if embeddings.size == 0:
             return jsonify({"error": "Failed to generate embeddings."}), 500
 
-        distance_threshold = 1 - float(current_app.config['SIMILARITY_THRESHOLD'])
-        clustering = AgglomerativeClustering(
-            n_clusters=None, metric='cosine', linkage='average', distance_threshold=distance_threshold
-        ).fit(embeddings)
-
-        initial_groups: Dict[int, list] = {}
-        for i, label in enumerate(clustering.labels_):
-            initial_groups.setdefault(int(label), []).append(questions[i])
-
-        verified_groups = []
-        
-        for group in initial_groups.values():
-            if len(group) < 2:
-                continue
-
-            anchor_question = group[0]
-            anchor_text = clean_html(anchor_question.get('Question', ''))
-            candidates = group[1:]
-
-            confirmed_matches = verify_matches_with_llm(
-                ref_question=anchor_text,
-                candidates=candidates,
-                provider=reasoning_provider,
-                model_name=reasoning_model,
-                task_type='grouping'
-            )
-
-            final_group = [anchor_question] + confirmed_matches
-
-            if len(final_group) > 1:
-                verified_groups.append(final_group)
+        labels = cluster_labels(
+            embeddings, similarity_threshold, current_app.extensions['cluster_graph_min_size']
+        )
+
+        # Sort question indices by label once and split at label changes; only
+        # clusters with at least two members can form a group. Groups are then put
+        # back in order of their first question, as the list itself is ordered.
+        order = np.argsort(labels, kind='stable')
+        boundaries = np.flatnonzero(np.diff(labels[order])) + 1
+        initial_groups = sorted(
+            (bucket.tolist() for bucket in np.split(order, boundaries) if bucket.size > 1),
+            key=itemgetter(0)
+        )
+
+        confirmed = verify_groups_with_llm(
+            [(questions_text[group[0]], [questions[i] for i in group[1:]]) for group in initial_groups],
+            provider=reasoning_provider,
+            model_name=reasoning_model
+        )
+        verified_groups = [
+            [questions[group[0]]] + matches for group, matches in zip(initial_groups, confirmed) if matches
+        ]
 
-        if verified_groups:
-            return jsonify({"response": "yes", "matched_groups": verified_groups}), 200
-        else:
-            return jsonify({"response": "no"}), 200
+        with _group_cache_lock:
+            _group_cache[cache_key] = verified_groups
+        return _grouping_response(verified_groups)
 
     except AIServiceUnavailableError as e:
         return jsonify({"error": str(e)}), 503
     except Exception:
-        logging.error("An unexpected error occurred in group_similar_questions", exc_info=True)
+        current_app.logger.error("An unexpected error occurred in group_similar_questions", exc_info=True)
         return jsonify({"error": "An internal server error occurred."}), 500
\ No newline at end of file
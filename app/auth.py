@@ -1,31 +1,32 @@
 import logging
 from flask import request, jsonify, Blueprint, current_app
 from flask_jwt_extended import create_access_token
-from marshmallow import ValidationError
-from .schemas import LoginSchema
+from pydantic import ValidationError
+from .schemas import LoginSchema, validation_messages
 from . import limiter
 
+logger = logging.getLogger(__name__)
+
 auth_bp = Blueprint('auth', __name__)
-login_schema = LoginSchema()
 
 @auth_bp.route('/login', methods=['POST'])
 @limiter.limit("10 per minute")
 def login():
     try:
-        data = login_schema.load(request.get_json())
+        data = LoginSchema.model_validate_json(request.get_data(cache=False))
     except ValidationError as err:
-        return jsonify(err.messages), 400
+        return jsonify(validation_messages(err)), 400
     
-    username = data['username']
-    password = data['password']
+    username = data.username
+    password = data.password
 
     admin_user = current_app.config['ADMIN_USERNAME']
     admin_pass = current_app.config['ADMIN_PASSWORD']
 
     if username == admin_user and password == admin_pass:
-        logging.info(f"Successful login for user: {username}")
+        logger.info(f"Successful login for user: {username}")
         access_token = create_access_token(identity=username)
         return jsonify(access_token=access_token)
 
-    logging.warning(f"Failed login attempt for user: {username}")
+    logger.warning(f"Failed login attempt for user: {username}")
     return jsonify({"error": "Bad username or password"}), 401
\ No newline at end of file
@@ -0,0 +1,108 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional
+
+
+class _Pending(NamedTuple):
+    key: Hashable
+    items: List[Any]
+    future: Future
+
+
+def _fail(requests: List[_Pending], error: BaseException) -> None:
+    for request in requests:
+        request.future.set_exception(error)
+
+
+class MicroBatcher:
+    """
+    Coalesces small requests that arrive within a short window into one call per key.
+
+    dispatch_fn(key, items) must return one result per item, in order. Each
+    submit() gets a Future resolved with the results for its own items. Once
+    shut down, submit() raises RuntimeError and queued requests fail with it.
+    """
+
+    def __init__(
+        self,
+        dispatch_fn: Callable[[Hashable, List[Any]], List[Any]],
+        max_items: int,
+        max_wait: float,
+        name: str
+    ):
+        self._dispatch_fn = dispatch_fn
+        self._max_items = max_items
+        self._max_wait = max_wait
+        self._name = name
+        self._queue: "queue.SimpleQueue[_Pending]" = queue.SimpleQueue()
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix=f'{name}-dispatch')
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+
+    def _ensure_started(self) -> None:
+        """Starts the collector thread on first use, and again in a forked worker."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+                self._thread.start()
+
+    def submit(self, key: Hashable, items: List[Any]) -> Future:
+        """Queues items for the next batch with the same key."""
+        if self._closed:
+            raise RuntimeError(f"{self._name} has been shut down")
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put(_Pending(key, list(items), future))
+        return future
+
+    def shutdown(self) -> None:
+        """Refuses further submissions and stops the dispatch executor."""
+        self._closed = True
+        self._executor.shutdown(wait=False)
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            pending = [first]
+            count = len(first.items)
+            deadline = time.monotonic() + self._max_wait
+            while count < self._max_items:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                pending.append(item)
+                count += len(item.items)
+
+            groups: Dict[Hashable, List[_Pending]] = {}
+            for item in pending:
+                groups.setdefault(item.key, []).append(item)
+            for key, requests in groups.items():
+                try:
+                    self._executor.submit(self._dispatch, key, requests)
+                except RuntimeError as e:
+                    # The executor was shut down, possibly by interpreter exit; fail the
+                    # waiting callers instead of letting this thread die with them blocked.
+                    self._closed = True
+                    _fail(requests, e)
+
+    def _dispatch(self, key: Hashable, requests: List[_Pending]) -> None:
+        items = [item for request in requests for item in request.items]
+        try:
+            results = self._dispatch_fn(key, items)
+        except Exception as e:
+            _fail(requests, e)
+            return
+
+        offset = 0
+        for request in requests:
+            request.future.set_result(results[offset:offset + len(request.items)])
+            offset += len(request.items)
@@ -0,0 +1,88 @@
+import numpy as np
+from scipy.cluster.hierarchy import fcluster, linkage
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import breadth_first_order, connected_components
+from scipy.spatial.distance import squareform
+
+# Number of rows scored against the full matrix at a time on the neighbour-graph path.
+_GRAPH_BLOCK_ROWS = 1024
+
+
+def _cosine_distances(matrix: np.ndarray) -> np.ndarray:
+    """Pairwise cosine distances from a single float32 matrix product of the normalized rows."""
+    distances = 1.0 - matrix @ matrix.T
+    np.fill_diagonal(distances, 0.0)
+    np.maximum(distances, 0.0, out=distances)
+    return distances
+
+def _agglomerative_labels(matrix: np.ndarray, similarity_threshold: float) -> np.ndarray:
+    """Average-linkage clustering on cosine distance, cut at 1 - similarity_threshold."""
+    condensed = squareform(_cosine_distances(matrix), checks=False)
+    tree = linkage(condensed, method='average')
+    return fcluster(tree, t=1 - similarity_threshold, criterion='distance')
+
+def _neighbour_graph_labels(
+    matrix: np.ndarray,
+    similarity_threshold: float,
+    max_component_size: int
+) -> np.ndarray:
+    """
+    Average-linkage clusters found within the neighbour graph's connected components.
+
+    The graph links every pair of questions at or above the threshold. Average
+    linkage never merges clusters with no such pair between them, so clustering
+    each component on its own gives the same labels as clustering the whole set,
+    with memory quadratic only in the component size. Similarities are computed in
+    row blocks so the graph itself stays linear in the number of questions.
+
+    A component of max_component_size or more questions is too large for one
+    distance matrix. It is taken in breadth-first order through the graph, so
+    neighbouring questions stay together, and clustered in consecutive chunks
+    smaller than max_component_size. A cluster can then be cut at a chunk
+    boundary, but no cluster is ever a chained single-linkage component.
+    """
+    n = matrix.shape[0]
+    rows, cols = [], []
+    for start in range(0, n, _GRAPH_BLOCK_ROWS):
+        block = matrix[start:start + _GRAPH_BLOCK_ROWS] @ matrix.T
+        block_rows, block_cols = np.nonzero(block >= similarity_threshold)
+        rows.append(block_rows + start)
+        cols.append(block_cols)
+
+    row_idx = np.concatenate(rows)
+    col_idx = np.concatenate(cols)
+    graph = coo_matrix((np.ones(row_idx.size, dtype=np.int8), (row_idx, col_idx)), shape=(n, n)).tocsr()
+    n_components, labels = connected_components(graph, directed=False)
+
+    # Components of one or two questions are already what average linkage would produce.
+    sizes = np.bincount(labels, minlength=n_components)
+    members_by_component = np.split(np.argsort(labels, kind='stable'), np.cumsum(sizes)[:-1])
+    next_label = n_components
+    chunk_size = max(max_component_size - 1, 2)
+    for component in np.flatnonzero(sizes > 2).tolist():
+        members = members_by_component[component]
+        if members.size <= chunk_size:
+            chunks = [members]
+        else:
+            members = breadth_first_order(graph, members[0], directed=False, return_predecessors=False)
+            chunks = np.array_split(members, -(-members.size // chunk_size))
+        for chunk in chunks:
+            sub_labels = _agglomerative_labels(matrix[chunk], similarity_threshold)
+            labels[chunk] = next_label + sub_labels
+            next_label += int(sub_labels.max()) + 1
+    return labels
+
+def cluster_labels(embeddings: np.ndarray, similarity_threshold: float, graph_min_size: int) -> np.ndarray:
+    """
+    Assigns a cluster label to every embedding.
+
+    Sets of at least graph_min_size questions are first split into connected
+    components of the neighbour graph, since the pairwise distance matrix of
+    average-linkage clustering grows quadratically; the labels are the same unless a
+    single component reaches graph_min_size questions and has to be clustered in chunks.
+    embeddings must have L2-normalized rows, as returned by get_embeddings().
+    """
+    matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if matrix.shape[0] >= graph_min_size:
+        return _neighbour_graph_labels(matrix, similarity_threshold, graph_min_size)
+    return _agglomerative_labels(matrix, similarity_threshold)
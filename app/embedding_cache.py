@@ -0,0 +1,74 @@
+import hashlib
+import threading
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+from cachetools import LRUCache
+
+from .sim_cache import normalize_rows_inplace
+
+_cache: LRUCache = LRUCache(maxsize=100_000)
+_lock = threading.RLock()
+
+
+def _text_key(text: str) -> str:
+    """Returns a stable digest for the normalized form of a text."""
+    return hashlib.blake2b(text.strip().lower().encode(), digest_size=16).hexdigest()
+
+def get_or_compute(
+    texts: Sequence[str],
+    provider: str,
+    model: str,
+    fetch_fn: Callable[[List[str]], List[List[float]]]
+) -> np.ndarray:
+    """
+    Returns embeddings for texts, only calling fetch_fn for texts not already cached.
+    Repeated texts within one call are fetched once.
+
+    Results are L2-normalized rows of a freshly allocated float32 matrix, in the
+    same order as texts; fetched embeddings are normalized once, before caching.
+    """
+    keys = [(provider, model, _text_key(text)) for text in texts]
+    hits: List[Tuple[int, np.ndarray]] = []
+    missing: List[int] = []
+    # Texts with the same key are fetched once: missing_rows[j] is the fetched row for missing[j].
+    missing_rows: List[int] = []
+    to_fetch: List[int] = []
+    fetch_rows: Dict[Tuple[str, str, str], int] = {}
+
+    with _lock:
+        for i, key in enumerate(keys):
+            vector = _cache.get(key)
+            if vector is not None:
+                hits.append((i, vector))
+                continue
+            row = fetch_rows.get(key)
+            if row is None:
+                row = fetch_rows[key] = len(to_fetch)
+                to_fetch.append(i)
+            missing.append(i)
+            missing_rows.append(row)
+
+    fetched = None
+    if to_fetch:
+        fetched = normalize_rows_inplace(
+            np.array(fetch_fn([texts[i] for i in to_fetch]), dtype=np.float32)
+        )
+
+    if fetched is not None:
+        dim = fetched.shape[1]
+    elif hits:
+        dim = hits[0][1].shape[0]
+    else:
+        dim = 0
+
+    out = np.empty((len(texts), dim), dtype=np.float32)
+    for i, vector in hits:
+        out[i] = vector
+    if fetched is not None:
+        out[missing] = fetched[missing_rows]
+        with _lock:
+            for row, i in enumerate(to_fetch):
+                _cache[keys[i]] = fetched[row]
+
+    return out
@@ -1,14 +1,96 @@
+import hashlib
+import html
 import logging
+import re
+import threading
 import requests
-import json
-from json import JSONDecodeError
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import numpy as np
+import orjson
+from typing import List, Dict, Any, Optional, Tuple
 
-from flask import current_app
-from google import genai
+from cachetools import LRUCache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from google.genai import types 
-from bs4 import BeautifulSoup
-from . import openai_client, deepseek_client, gemini_client
+from . import openai_client, deepseek_client, gemini_client, embedding_cache, rate_limit
+from .batching import MicroBatcher
+
+logger = logging.getLogger(__name__)
+
+# Only real tags: a '<' followed by a letter, '/' + letter or '!'; a bare '<' in text is kept.
+_TAG_RE = re.compile(r'</?[A-Za-z!][^>]*>')
+# Tags that break a line or start a block and so separate words; other tags are removed in place.
+_BLOCK_TAG_RE = re.compile(
+    r'</?(?:address|article|aside|blockquote|br|dd|div|dl|dt|figcaption|figure|footer|h[1-6]|header|hr'
+    r'|li|main|nav|ol|p|pre|section|table|tbody|td|tfoot|th|thead|tr|ul)\b[^>]*>',
+    re.IGNORECASE
+)
+_WS_RE = re.compile(r'\s+')
+# A reply that is exactly {"match_ids": [ints]}, the shape the verification prompt asks for.
+_MATCH_IDS_RE = re.compile(r'\s*\{\s*"match_ids"\s*:\s*\[\s*(\d+(?:\s*,\s*\d+)*)?\s*\]\s*\}\s*\Z')
+# Comments and raw-text elements, whose contents are never question text.
+_NON_TEXT_RE = re.compile(r'<!--.*?-->|<(script|style)\b[^>]*>.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+
+# Shared session so repeated fetches reuse pooled keep-alive connections.
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(
+    pool_connections=32, pool_maxsize=64,
+    max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+)
+_SESSION.mount('https://', _ADAPTER)
+_SESSION.mount('http://', _ADAPTER)
+
+# Maximum number of texts each provider accepts in a single embedding request.
+EMBEDDING_BATCH_SIZES = {'gemini': 100, 'openai': 2048}
+# Batches of one large embedding request that may be in flight at once.
+_embedding_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='embeddings')
+
+# Uncached lists up to this size (typically a single new question) are coalesced
+# with concurrent requests for the same provider and model into one API call.
+MICRO_BATCH_MAX_SUBMIT = 8
+MICRO_BATCH_MAX_TEXTS = 256
+MICRO_BATCH_WAIT_SECONDS = 0.01
+# Longest a caller waits on a micro-batched request before giving up on the provider.
+MICRO_BATCH_RESULT_TIMEOUT_SECONDS = 60
+
+# The SDK only reads request configs, so one instance of each is shared by every Gemini call.
+_GEMINI_JSON_CONFIG = types.GenerateContentConfig(response_mime_type="application/json")
+_GEMINI_EMBED_CONFIG = types.EmbedContentConfig(task_type="RETRIEVAL_DOCUMENT", output_dimensionality=768)
+
+_SIMILARITY_SYSTEM_PROMPT = (
+    "You are a strict Duplicate Question Detector. "
+    "Compare the 'New Question' with the 'Candidate Questions'. "
+    "Identify which candidates are semantically identical (meaning exactly the same thing) to the New Question. "
+    "Respond ONLY with a valid JSON object with a single key: 'match_ids' (list of integers). "
+    "If none match, return 'match_ids': []."
+)
+_GROUPING_SYSTEM_PROMPT = (
+    "You are an expert Semantic Grouper. "
+    "The 'Anchor Question' defines the specific topic and intent of a group. "
+    "Compare the 'Candidate Questions' against this Anchor. "
+    "Identify which candidates share the EXACT same semantic meaning and intent as the Anchor, suitable for merging into a single group. "
+    "Respond ONLY with a valid JSON object with a single key: 'match_ids' (list of integers). "
+    "If none match, return 'match_ids': []."
+)
+_GROUP_BATCH_SYSTEM_PROMPT = (
+    "You are an expert Semantic Grouper. "
+    "You are given several numbered groups. In each group, the 'Anchor Question' defines the specific topic and intent of the group. "
+    "For every group, compare its 'Candidate Questions' against its own Anchor only. "
+    "Identify which candidates share the EXACT same semantic meaning and intent as the Anchor, suitable for merging into a single group. "
+    "Respond ONLY with a valid JSON object with a single key: 'groups', a list of objects with keys "
+    "'group_id' (integer) and 'match_ids' (list of integers). "
+    "If no candidate of a group matches, return 'match_ids': [] for that group."
+)
+
+# Candidate groups verified together in one grouping prompt.
+GROUP_VERIFY_BATCH_SIZE = 20
+# Verification prompts that may be in flight at once, across all requests.
+_verification_executor = ThreadPoolExecutor(max_workers=5, thread_name_prefix='llm-verify')
+
+# url -> (ETag, Last-Modified, parsed questions, version) for conditional re-fetches
+_FETCH_CACHE: LRUCache = LRUCache(maxsize=256)
+_fetch_cache_lock = threading.Lock()
 
 class AIServiceUnavailableError(Exception):
     """Custom exception for when an external AI service is unavailable."""
@@ -36,18 +118,62 @@ def clean_html(raw_html: str) -> str:
     """Removes HTML tags from a string."""
     if not raw_html:
         return ""
-    return BeautifulSoup(raw_html, "lxml").get_text().strip()
+    if '<' not in raw_html and '&' not in raw_html:
+        # No markup or entities: only whitespace needs collapsing.
+        return ' '.join(raw_html.split())
+    text = _BLOCK_TAG_RE.sub(' ', _NON_TEXT_RE.sub(' ', raw_html))
+    text = _TAG_RE.sub('', text)
+    return _WS_RE.sub(' ', html.unescape(text)).strip()
+
+def clean_html_many(raw_htmls: List[str]) -> List[str]:
+    """Removes HTML tags from every string in a list."""
+    return [clean_html(raw) for raw in raw_htmls]
+
+def fetch_questions_from_url(url: str) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+    """
+    Fetches and parses question data from a given URL.
+
+    Returns (questions, version), where version is the response ETag or, without
+    one, a digest of the body; questions is None if the URL could not be fetched
+    or parsed. Sends If-None-Match / If-Modified-Since when the URL returned an
+    ETag or Last-Modified before and reuses the previously parsed list on
+    304 Not Modified. The returned list is shared between requests and must
+    not be mutated.
+    """
+    with _fetch_cache_lock:
+        cached = _FETCH_CACHE.get(url)
+    headers = {}
+    if cached:
+        etag, last_modified = cached[0], cached[1]
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
 
-def fetch_questions_from_url(url: str) -> Optional[List[Dict[str, Any]]]:
-    """Fetches and parses question data from a given URL."""
     try:
-        response = requests.get(url, timeout=15)
+        response = _SESSION.get(url, headers=headers, timeout=15)
+        if cached and response.status_code == 304:
+            return cached[2], cached[3]
         response.raise_for_status()
-        data = response.json()
-        return data if isinstance(data, list) else None
-    except (requests.exceptions.RequestException, JSONDecodeError) as e:
-        logging.error(f"Error fetching or parsing URL {url}: {e}")
-        return None
+        data = orjson.loads(response.content)
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
+        logger.error(f"Error fetching or parsing URL {url}: {e}")
+        return None, None
+
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if not (etag or last_modified) or not isinstance(data, list):
+        # Nothing to revalidate against: drop any earlier entry so its validators are not resent.
+        with _fetch_cache_lock:
+            _FETCH_CACHE.pop(url, None)
+        if not isinstance(data, list):
+            return None, None
+
+    version = etag or hashlib.blake2b(response.content, digest_size=16).hexdigest()
+    if etag or last_modified:
+        with _fetch_cache_lock:
+            _FETCH_CACHE[url] = (etag, last_modified, data, version)
+    return data, version
 
 def verify_matches_with_llm(
     ref_question: str, 
@@ -73,86 +199,175 @@ def verify_matches_with_llm(
     ])
 
     if task_type == "grouping":
-        system_prompt = (
-            "You are an expert Semantic Grouper. "
-            "The 'Anchor Question' defines the specific topic and intent of a group. "
-            "Compare the 'Candidate Questions' against this Anchor. "
-            "Identify which candidates share the EXACT same semantic meaning and intent as the Anchor, suitable for merging into a single group. "
-            "Respond ONLY with a valid JSON object with a single key: 'match_ids' (list of integers). "
-            "If none match, return 'match_ids': []."
-        )
+        system_prompt = _GROUPING_SYSTEM_PROMPT
         user_content = f"Anchor Question: \"{ref_question}\"\n\nCandidate Questions:\n{candidates_formatted}"
     
     else:
-        system_prompt = (
-            "You are a strict Duplicate Question Detector. "
-            "Compare the 'New Question' with the 'Candidate Questions'. "
-            "Identify which candidates are semantically identical (meaning exactly the same thing) to the New Question. "
-            "Respond ONLY with a valid JSON object with a single key: 'match_ids' (list of integers). "
-            "If none match, return 'match_ids': []."
-        )
+        system_prompt = _SIMILARITY_SYSTEM_PROMPT
         user_content = f"New Question: \"{ref_question}\"\n\nCandidate Questions:\n{candidates_formatted}"
 
     try:
-        if provider == 'gemini':
-            client = get_ai_client('gemini')
-            response = client.models.generate_content(
-                model=model_name,
-                contents=f"{system_prompt}\n\n{user_content}",
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json"
-                )
-            )
-            result = json.loads(response.text)
-            
-        elif provider in ['openai', 'deepseek']:
-            client = get_ai_client(provider)
-            response = client.chat.completions.create(
-                model=model_name,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_content}
-                ],
-                response_format={"type": "json_object"}
-            )
-            result = json.loads(response.choices[0].message.content)
-        else:
-            raise ValueError(f"Unsupported reasoning provider: {provider}")
-
-        match_ids = result.get('match_ids', [])
+        match_ids = _parse_match_ids(_complete_json(system_prompt, user_content, provider, model_name))
         confirmed_matches = [candidates[i] for i in match_ids if 0 <= i < len(candidates)]
         return confirmed_matches
 
     except Exception as e:
-        logging.error(f"An unexpected error occurred with the '{provider}' service during double verification ({task_type}): {e}")
+        logger.error(f"An unexpected error occurred with the '{provider}' service during double verification ({task_type}): {e}")
         raise AIServiceUnavailableError(f"The AI service for '{provider}' is currently unavailable for verification.")
 
-def get_embeddings(texts: List[str], provider: str, model_name: str) -> List[List[float]]:
+def _parse_match_ids(reply: str) -> List[int]:
+    """Reads match_ids from a {"match_ids": [...]} reply, using orjson only for other shapes."""
+    match = _MATCH_IDS_RE.match(reply)
+    if match:
+        return [int(i) for i in match.group(1).split(',')] if match.group(1) else []
+    return orjson.loads(reply).get('match_ids', [])
+
+def verify_groups_with_llm(
+    groups: List[Tuple[str, List[Dict[str, Any]]]],
+    provider: str,
+    model_name: str
+) -> List[List[Dict[str, Any]]]:
     """
-    Generates embeddings for a list of texts.
+    Verifies several candidate groups with as few LLM calls as possible.
+
+    Groups are sent GROUP_VERIFY_BATCH_SIZE at a time and the batches are
+    verified concurrently; results keep the order of groups.
+
+    :param groups: (anchor question text, candidate questions) pairs.
+    :return: The confirmed candidates of each group, in the order of groups.
     """
+    batches = [groups[i:i + GROUP_VERIFY_BATCH_SIZE] for i in range(0, len(groups), GROUP_VERIFY_BATCH_SIZE)]
+    if len(batches) <= 1:
+        return _verify_group_batch(groups, provider, model_name) if groups else []
+
+    results = _verification_executor.map(lambda batch: _verify_group_batch(batch, provider, model_name), batches)
+    return [matches for batch in results for matches in batch]
+
+def _verify_group_batch(
+    batch: List[Tuple[str, List[Dict[str, Any]]]],
+    provider: str,
+    model_name: str
+) -> List[List[Dict[str, Any]]]:
+    """Verifies up to GROUP_VERIFY_BATCH_SIZE groups in a single prompt."""
+    user_content = "\n\n".join(
+        f"Group {g}:\nAnchor Question: \"{anchor}\"\nCandidate Questions:\n" + "\n".join(
+            f"ID {i}: {clean_html(c.get('Question', ''))}" for i, c in enumerate(candidates)
+        )
+        for g, (anchor, candidates) in enumerate(batch)
+    )
+
     try:
-        if provider == 'gemini':
-            client = get_ai_client('gemini')
-            result = client.models.embed_content(
-                model=model_name,
-                contents=texts,
-                config=types.EmbedContentConfig(
-                    task_type="RETRIEVAL_DOCUMENT",
-                    output_dimensionality=768 
-                )
-            )
-            embeddings = [e.values for e in result.embeddings]
-            return embeddings
-    
-        elif provider == 'openai':
-            client = get_ai_client('openai')
-            response = client.embeddings.create(input=texts, model=model_name)
-            return [item.embedding for item in response.data]
+        result = orjson.loads(_complete_json(_GROUP_BATCH_SYSTEM_PROMPT, user_content, provider, model_name))
+        match_ids_by_group: Dict[int, List[int]] = {}
+        for entry in result.get('groups', []):
+            group_id = entry.get('group_id')
+            if isinstance(group_id, int) and 0 <= group_id < len(batch):
+                match_ids_by_group[group_id] = entry.get('match_ids', [])
+
+        return [
+            [candidates[i] for i in match_ids_by_group.get(g, []) if 0 <= i < len(candidates)]
+            for g, (_, candidates) in enumerate(batch)
+        ]
 
-        else:
-            raise ValueError(f"Unsupported embedding provider: {provider}")
+    except Exception as e:
+        logger.error(f"An unexpected error occurred with the '{provider}' service during double verification (grouping batch): {e}")
+        raise AIServiceUnavailableError(f"The AI service for '{provider}' is currently unavailable for verification.")
+
+def _complete_json(system_prompt: str, user_content: str, provider: str, model_name: str) -> str:
+    """Sends one prompt to a reasoning provider and returns its raw JSON reply."""
+    rate_limit.acquire(provider, model_name)
+    if provider == 'gemini':
+        client = get_ai_client('gemini')
+        response = client.models.generate_content(
+            model=model_name,
+            contents=f"{system_prompt}\n\n{user_content}",
+            config=_GEMINI_JSON_CONFIG
+        )
+        return response.text
+
+    elif provider in ['openai', 'deepseek']:
+        client = get_ai_client(provider)
+        response = client.chat.completions.create(
+            model=model_name,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_content}
+            ],
+            response_format={"type": "json_object"}
+        )
+        return response.choices[0].message.content
+
+    else:
+        raise ValueError(f"Unsupported reasoning provider: {provider}")
+
+def _embed_batch(texts: List[str], provider: str, model_name: str) -> List[List[float]]:
+    """Embeds a single provider-sized batch of texts."""
+    rate_limit.acquire(provider, model_name)
+    if provider == 'gemini':
+        client = get_ai_client('gemini')
+        result = client.models.embed_content(
+            model=model_name,
+            contents=texts,
+            config=_GEMINI_EMBED_CONFIG
+        )
+        return [e.values for e in result.embeddings]
+
+    elif provider == 'openai':
+        client = get_ai_client('openai')
+        response = client.embeddings.create(input=texts, model=model_name)
+        return [item.embedding for item in response.data]
+
+    else:
+        raise ValueError(f"Unsupported embedding provider: {provider}")
+
+def _fetch_embeddings(texts: List[str], provider: str, model_name: str) -> List[List[float]]:
+    """
+    Requests embeddings for texts from the provider.
+
+    Lists larger than the provider's batch limit are split and the batches are
+    requested concurrently; results keep the order of texts.
+    """
+    try:
+        batch_size = EMBEDDING_BATCH_SIZES.get(provider, len(texts) or 1)
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        if len(batches) <= 1:
+            return _embed_batch(texts, provider, model_name)
+
+        results = _embedding_executor.map(lambda batch: _embed_batch(batch, provider, model_name), batches)
+        return [embedding for batch in results for embedding in batch]
 
     except Exception as e:
-        logging.error(f"An unexpected error occurred with the '{provider}' service during embedding: {e}")
-        raise AIServiceUnavailableError(f"The AI embedding service for '{provider}' is currently unavailable.")
\ No newline at end of file
+        logger.error(f"An unexpected error occurred with the '{provider}' service during embedding: {e}")
+        raise AIServiceUnavailableError(f"The AI embedding service for '{provider}' is currently unavailable.")
+
+_embedding_batcher = MicroBatcher(
+    lambda key, texts: _fetch_embeddings(texts, *key),
+    max_items=MICRO_BATCH_MAX_TEXTS,
+    max_wait=MICRO_BATCH_WAIT_SECONDS,
+    name='embedding-batcher'
+)
+
+def get_embeddings(texts: List[str], provider: str, model_name: str) -> np.ndarray:
+    """
+    Generates embeddings for a list of texts.
+
+    Returns a float32 matrix with one L2-normalized row per text, so cosine
+    similarity is a plain dot product. Texts already embedded with the same
+    provider and model are served from the process-wide embedding cache; only
+    the rest are sent to the provider. Small requests are micro-batched with
+    concurrent ones for the same provider and model.
+    """
+    def fetch(uncached: List[str]) -> List[List[float]]:
+        if len(uncached) > MICRO_BATCH_MAX_SUBMIT:
+            return _fetch_embeddings(uncached, provider, model_name)
+        try:
+            future = _embedding_batcher.submit((provider, model_name), uncached)
+        except RuntimeError:
+            # The batcher is shut down (interpreter exit); request directly instead.
+            return _fetch_embeddings(uncached, provider, model_name)
+        try:
+            return future.result(timeout=MICRO_BATCH_RESULT_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            raise AIServiceUnavailableError(f"The AI embedding service for '{provider}' is currently unavailable.")
+
+    return embedding_cache.get_or_compute(texts, provider, model_name, fetch)
@@ -0,0 +1,47 @@
+import hashlib
+import threading
+import time
+
+from cachetools import TTLCache
+from flask import Flask, current_app
+from flask_jwt_extended import JWTManager
+
+
+class CachingJWTManager(JWTManager):
+    """
+    JWTManager that remembers the claims of recently verified tokens.
+
+    Repeat requests with the same token skip signature verification until the
+    cache entry's TTL or the token's own expiry, whichever comes first. Each app
+    gets its own cache in app.extensions, so a token verified with one app's
+    keys is never accepted by another app sharing this manager.
+    """
+
+    def __init__(self, *args, cache_size: int = 10_000, cache_ttl: float = 60, **kwargs):
+        self._cache_size = cache_size
+        self._cache_ttl = cache_ttl
+        self._claims_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def init_app(self, app: Flask, add_context_processor: bool = False) -> None:
+        super().init_app(app, add_context_processor)
+        app.extensions['jwt_claims_cache'] = TTLCache(maxsize=self._cache_size, ttl=self._cache_ttl)
+
+    def _decode_jwt_from_config(self, encoded_token: str, csrf_value=None, allow_expired: bool = False) -> dict:
+        if csrf_value is not None or allow_expired:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        claims_cache: TTLCache = current_app.extensions['jwt_claims_cache']
+        key = hashlib.blake2b(encoded_token.encode(), digest_size=16).digest()
+        with self._claims_lock:
+            claims = claims_cache.get(key)
+        if claims is not None:
+            exp = claims.get('exp')
+            if exp is None or exp > time.time():
+                return dict(claims)
+
+        # Expired or unknown tokens go through full verification, which raises as usual.
+        claims = super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+        with self._claims_lock:
+            claims_cache[key] = claims
+        return dict(claims)
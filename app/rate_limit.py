@@ -0,0 +1,53 @@
+import threading
+import time
+from typing import Dict, Tuple
+
+# Defaults until configure() is called from the app factory.
+_rate = 10.0
+_burst = 20
+_buckets: Dict[Tuple[str, str], "TokenBucket"] = {}
+_lock = threading.Lock()
+
+
+class TokenBucket:
+    """Token bucket refilled at rate tokens per second and holding at most burst tokens."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Blocks until a token is available, then takes it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def configure(rate: float, burst: int) -> None:
+    """Sets the per-model request rate; a rate of 0 or less disables pacing."""
+    global _rate, _burst
+    with _lock:
+        _rate = rate
+        _burst = max(1, burst)
+        _buckets.clear()
+
+def acquire(provider: str, model_name: str) -> None:
+    """Waits for a request slot for (provider, model_name) before calling its API."""
+    if _rate <= 0:
+        return
+    key = (provider, model_name)
+    with _lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = _buckets[key] = TokenBucket(_rate, _burst)
+    bucket.acquire()
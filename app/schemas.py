@@ -1,24 +1,68 @@
-from marshmallow import validate
-from . import ma
+import re
+from typing import Any, Dict, List, Literal
 
+from pydantic import BaseModel, ConfigDict, HttpUrl, ValidationError
 
-SUPPORTED_EMBEDDING_PROVIDERS = ["gemini", "openai"]
-SUPPORTED_REASONING_PROVIDERS = ["gemini", "openai", "deepseek"]
 
-class LoginSchema(ma.Schema):
+EmbeddingProvider = Literal["gemini", "openai"]
+ReasoningProvider = Literal["gemini", "openai", "deepseek"]
+
+# Messages the API returned when requests were validated with marshmallow, by pydantic error type.
+_MESSAGES = {
+    'missing': "Missing data for required field.",
+    'extra_forbidden': "Unknown field.",
+    'string_type': "Not a valid string.",
+    'bool_type': "Not a valid boolean.",
+    'bool_parsing': "Not a valid boolean.",
+    'model_type': "Invalid input type.",
+    'model_attributes_type': "Invalid input type.",
+    'json_type': "Invalid input type.",
+    'json_invalid': "Invalid input type.",
+}
+_QUOTED_RE = re.compile(r"'([^']*)'")
+
+class LoginSchema(BaseModel):
     """Schema for login request."""
-    username = ma.Str(required=True)
-    password = ma.Str(required=True)
+    model_config = ConfigDict(extra='forbid')
 
-class SimilarityCheckSchema(ma.Schema):
+    username: str
+    password: str
+
+class SimilarityCheckSchema(BaseModel):
     """Schema for similarity check request."""
-    questions_url = ma.URL(required=True)
-    question = ma.Str(required=True)
-    embedding_provider = ma.Str(required=True, validate=validate.OneOf(SUPPORTED_EMBEDDING_PROVIDERS))
-    reasoning_provider = ma.Str(required=True, validate=validate.OneOf(SUPPORTED_REASONING_PROVIDERS))
+    model_config = ConfigDict(extra='forbid')
+
+    questions_url: HttpUrl
+    question: str
+    embedding_provider: EmbeddingProvider
+    reasoning_provider: ReasoningProvider
+    short_circuit: bool = False
 
-class GroupingSchema(ma.Schema):
+class GroupingSchema(BaseModel):
     """Schema for question grouping request."""
-    questions_url = ma.URL(required=True)
-    embedding_provider = ma.Str(required=True, validate=validate.OneOf(SUPPORTED_EMBEDDING_PROVIDERS))
-    reasoning_provider = ma.Str(required=True, validate=validate.OneOf(SUPPORTED_REASONING_PROVIDERS))
+    model_config = ConfigDict(extra='forbid')
+
+    questions_url: HttpUrl
+    embedding_provider: EmbeddingProvider
+    reasoning_provider: ReasoningProvider
+
+def _message(error: Dict[str, Any]) -> str:
+    error_type = error['type']
+    if error['loc'] and error_type != 'missing' and error.get('input', ...) is None:
+        return "Field may not be null."
+    if error_type == 'literal_error':
+        if not isinstance(error['input'], str):
+            return _MESSAGES['string_type']
+        choices = _QUOTED_RE.findall(error['ctx']['expected'])
+        return f"Must be one of: {', '.join(choices)}."
+    if error_type.startswith('url_'):
+        return "Not a valid URL."
+    return _MESSAGES.get(error_type, error['msg'])
+
+def validation_messages(err: ValidationError) -> Dict[str, List[str]]:
+    """Formats pydantic validation errors in the {field: [messages]} shape the API has always returned."""
+    messages: Dict[str, List[str]] = {}
+    for error in err.errors():
+        field = str(error['loc'][0]) if error['loc'] else '_schema'
+        messages.setdefault(field, []).append(_message(error))
+    return messages
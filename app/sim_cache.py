@@ -0,0 +1,81 @@
+import hashlib
+import threading
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+from cachetools import LRUCache
+
+# (questions_url, provider, model) -> (content digest, row-normalized float32 matrix)
+_cache: LRUCache = LRUCache(maxsize=64)
+# questions_url -> (content digest, {normalized text hash: first matching row})
+_lookup_cache: LRUCache = LRUCache(maxsize=64)
+_lock = threading.Lock()
+
+
+def content_digest(texts: Sequence[str]) -> str:
+    """Returns a digest identifying an ordered list of question texts."""
+    digest = hashlib.blake2b(digest_size=16)
+    for text in texts:
+        digest.update(text.encode())
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+def exact_text_key(text: str) -> bytes:
+    """Returns the hash used to detect exact (case- and padding-insensitive) duplicates."""
+    return hashlib.blake2b(text.lower().strip().encode(), digest_size=16).digest()
+
+def get_exact_lookup(questions_url: str, texts: Sequence[str], digest: str) -> Dict[bytes, int]:
+    """Returns a map from exact_text_key() to the index of the first question with that text."""
+    with _lock:
+        entry = _lookup_cache.get(questions_url)
+    if entry is not None and entry[0] == digest:
+        return entry[1]
+
+    lookup: Dict[bytes, int] = {}
+    for i, text in enumerate(texts):
+        lookup.setdefault(exact_text_key(text), i)
+    with _lock:
+        _lookup_cache[questions_url] = (digest, lookup)
+    return lookup
+
+def normalize_rows_inplace(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalizes each row of a float matrix in place, leaving all-zero rows untouched."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+def score(matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Returns the cosine similarity of every row of a cached matrix to a normalized query."""
+    return matrix @ np.asarray(query, dtype=np.float32)
+
+def iter_scores(matrix: np.ndarray, query: np.ndarray, block_rows: int) -> Iterator[Tuple[int, np.ndarray]]:
+    """Yields (first row, similarities) for consecutive row blocks, so callers can stop early."""
+    for start in range(0, matrix.shape[0], block_rows):
+        yield start, score(matrix[start:start + block_rows], query)
+
+def get_normalized_matrix(
+    questions_url: str,
+    texts: Sequence[str],
+    digest: str,
+    provider: str,
+    model: str,
+    compute_fn: Callable[[List[str]], np.ndarray]
+) -> np.ndarray:
+    """
+    Returns the row-normalized embedding matrix for the questions behind a URL.
+
+    compute_fn must return row-normalized embeddings, as get_embeddings() does.
+    The matrix is rebuilt only when digest, the content_digest() of texts, changes.
+    """
+    key: Tuple[str, str, str] = (questions_url, provider, model)
+
+    with _lock:
+        entry = _cache.get(key)
+    if entry is not None and entry[0] == digest:
+        return entry[1]
+
+    matrix = np.asarray(compute_fn(list(texts)), dtype=np.float32)
+    with _lock:
+        _cache[key] = (digest, matrix)
+    return matrix
@@ -21,6 +21,11 @@ class Config:
 
     # Custom App Settings
     SIMILARITY_THRESHOLD = float(os.environ.get('SIMILARITY_THRESHOLD', 0.85))
+    # Question sets at least this large are split into neighbour-graph components before agglomerative clustering
+    CLUSTER_GRAPH_MIN_SIZE = int(os.environ.get('CLUSTER_GRAPH_MIN_SIZE', 2000))
+    # Outgoing AI API calls are paced per (provider, model) with a token bucket in each worker process; 0 disables pacing
+    PROVIDER_REQUESTS_PER_SECOND = float(os.environ.get('PROVIDER_REQUESTS_PER_SECOND', 10))
+    PROVIDER_REQUEST_BURST = int(os.environ.get('PROVIDER_REQUEST_BURST', 20))
     
     # --- Specific Model Name Configuration ---
     GEMINI_EMBEDDING_MODEL = os.environ.get('GEMINI_EMBEDDING_MODEL')
@@ -31,5 +36,9 @@ class Config:
     DEEPSEEK_REASONING_MODEL = os.environ.get('DEEPSEEK_REASONING_MODEL')
     
     # CORS & Rate Limiting
-    CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*').split(',')
-    RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI',"memcached://memcached:11211")
\ No newline at end of file
+    CORS_ORIGINS = frozenset(
+        origin.strip() for origin in os.environ.get('CORS_ORIGINS', '*').split(',') if origin.strip()
+    )
+    RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI',"redis://redis:6379")
+    # moving-window is enforced atomically in Redis with a single Lua script call per check
+    RATELIMIT_STRATEGY = os.environ.get('RATELIMIT_STRATEGY', 'moving-window')
\ No newline at end of file
@@ -0,0 +1,37 @@
+# Production server settings: gunicorn -c gunicorn_conf.py run:app
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Each worker keeps its own embedding, matrix and result caches and its own provider
+# token buckets, so more workers mean more memory and a higher combined request rate
+# to the AI providers. Default to the CPUs this process may run on, capped at 4.
+if hasattr(os, 'sched_getaffinity'):
+    _available_cpus = len(os.sched_getaffinity(0))
+else:
+    _available_cpus = os.cpu_count() or 1
+workers = int(os.environ.get('GUNICORN_WORKERS', min(_available_cpus, 4)))
+
+# Requests spend most of their time waiting on question URLs and AI provider APIs,
+# so each worker serves several of them concurrently on threads.
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Keep client connections open across requests (longer than typical load balancer idle timeouts).
+keepalive = 75
+timeout = 60
+
+# Build the app (and its AI clients) once in the master; workers inherit it copy-on-write.
+preload_app = True
+
+
+def pre_fork(server, worker):
+    from app import stop_log_listener
+    from run import app as flask_app
+    stop_log_listener(flask_app)
+
+
+def post_fork(server, worker):
+    from app import restart_log_listener
+    from run import app as flask_app
+    restart_log_listener(flask_app)
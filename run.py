@@ -5,4 +5,5 @@ app = create_app()
 if __name__ == '__main__':
     # For development, the reloader is useful.
     # For production, use Gunicorn as specified in the Dockerfile.
+    print("Development server only; use `gunicorn -c gunicorn_conf.py run:app` for production.")
     app.run(debug=False, port=5000)
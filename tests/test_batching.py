@@ -0,0 +1,53 @@
+import pytest
+
+from app.batching import MicroBatcher
+
+
+def test_coalesces_requests_per_key():
+    calls = []
+
+    def dispatch(key, items):
+        calls.append((key, list(items)))
+        return [f"{key}:{item}" for item in items]
+
+    batcher = MicroBatcher(dispatch, max_items=16, max_wait=0.05, name='test-batcher')
+    first = batcher.submit('a', [1, 2])
+    second = batcher.submit('a', [3])
+    other = batcher.submit('b', [4])
+
+    assert first.result(timeout=5) == ['a:1', 'a:2']
+    assert second.result(timeout=5) == ['a:3']
+    assert other.result(timeout=5) == ['b:4']
+    assert sorted(calls) == [('a', [1, 2, 3]), ('b', [4])]
+    batcher.shutdown()
+
+
+def test_dispatch_error_fails_every_request():
+    def dispatch(key, items):
+        raise ValueError("boom")
+
+    batcher = MicroBatcher(dispatch, max_items=16, max_wait=0.01, name='test-batcher')
+    future = batcher.submit('a', [1])
+    with pytest.raises(ValueError):
+        future.result(timeout=5)
+    batcher.shutdown()
+
+
+def test_submit_after_shutdown_is_refused():
+    batcher = MicroBatcher(lambda key, items: items, max_items=16, max_wait=0.01, name='test-batcher')
+    batcher.shutdown()
+    with pytest.raises(RuntimeError):
+        batcher.submit('a', [1])
+
+
+def test_pending_requests_fail_when_executor_is_gone():
+    batcher = MicroBatcher(lambda key, items: items, max_items=16, max_wait=0.2, name='test-batcher')
+    # Shut the dispatch executor down while a request waits in the collection window,
+    # as happens at interpreter exit.
+    future = batcher.submit('a', [1])
+    batcher._executor.shutdown(wait=False)
+
+    with pytest.raises(RuntimeError):
+        future.result(timeout=5)
+    with pytest.raises(RuntimeError):
+        batcher.submit('a', [2])
@@ -0,0 +1,52 @@
+import numpy as np
+
+from app.clustering import cluster_labels
+
+
+def _unit_rows(matrix):
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def _partition(labels):
+    groups = {}
+    for i, label in enumerate(labels.tolist()):
+        groups.setdefault(label, []).append(i)
+    return sorted(groups.values())
+
+
+def _chain(length, step):
+    # Consecutive rows are close, the ends are far apart: one component, several clusters.
+    angles = np.arange(length) * step
+    return np.stack([np.cos(angles), np.sin(angles)], axis=1).astype(np.float32)
+
+
+def test_graph_path_matches_average_linkage():
+    rng = np.random.default_rng(0)
+    centres = rng.normal(size=(20, 32))
+    points = np.concatenate([centres[i] + 0.3 * rng.normal(size=(10, 32)) for i in range(20)])
+    embeddings = _unit_rows(points.astype(np.float32))
+
+    small_path = cluster_labels(embeddings, 0.8, graph_min_size=len(embeddings) + 1)
+    graph_path = cluster_labels(embeddings, 0.8, graph_min_size=100)
+    assert _partition(graph_path) == _partition(small_path)
+
+
+def test_graph_path_does_not_merge_chains():
+    chain = _chain(12, 0.3)
+    padding = np.zeros((12, 1), dtype=np.float32)
+    embeddings = np.block([[chain, padding, padding], [padding, padding, chain]])
+    threshold = float(np.cos(0.35))
+
+    small_path = cluster_labels(embeddings, threshold, graph_min_size=100)
+    graph_path = cluster_labels(embeddings, threshold, graph_min_size=13)
+    assert len(_partition(small_path)) > 1
+    assert _partition(graph_path) == _partition(small_path)
+
+
+def test_oversized_components_are_clustered_in_chunks():
+    embeddings = _chain(40, 0.1)
+    threshold = float(np.cos(0.15))
+
+    groups = _partition(cluster_labels(embeddings, threshold, graph_min_size=10))
+    assert len(groups) > 1
+    assert max(len(group) for group in groups) < 10
@@ -0,0 +1,62 @@
+import pytest
+
+from app import helpers
+from app.helpers import clean_html, clean_html_many
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("Is 3 < 9 and 1 > 2?", "Is 3 < 9 and 1 > 2?"),
+    ("x<5 or y>7", "x<5 or y>7"),
+    ("H<sub>2</sub>O", "H2O"),
+    ("<b>Bold</b>face and <i>it</i>alic", "Boldface and italic"),
+    ("<p>First</p><p>Second</p>", "First Second"),
+    ("one<br>two<br/>three", "one two three"),
+    ("<ul><li>a</li><li>b</li></ul>", "a b"),
+    ("Is 3 &lt; 9?", "Is 3 < 9?"),
+    ("Salt&nbsp;&amp;&nbsp;pepper", "Salt & pepper"),
+    ("a<!-- note -->b<script>var x = 1 > 0;</script>", "a b"),
+    ("  plain \n text ", "plain text"),
+    ("", ""),
+])
+def test_clean_html(raw, expected):
+    assert clean_html(raw) == expected
+
+
+def test_clean_html_does_not_merge_comparisons_with_question_text():
+    # Distinct questions must not collapse to the same cleaned text.
+    assert clean_html("Is 3 < 9 and 1 > 2?") != clean_html("Is 3 2?")
+
+
+def test_clean_html_many_matches_clean_html():
+    raws = ["<p>a</p>", "Is 3 < 9 and 1 > 2?", "H<sub>2</sub>O", "", "a &amp; b"]
+    assert clean_html_many(raws) == [clean_html(raw) for raw in raws]
+
+
+class _Response:
+    def __init__(self, status_code, body=b'[]', headers=None):
+        self.status_code = status_code
+        self.content = body
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        pass
+
+
+def test_fetch_drops_validators_when_a_response_has_none(monkeypatch):
+    url = 'https://example.com/validators.json'
+    responses = [
+        _Response(200, b'[{"Question": "a"}]', {'ETag': '"v1"'}),
+        _Response(200, b'[{"Question": "b"}]'),
+        _Response(200, b'[{"Question": "c"}]'),
+    ]
+    sent_headers = []
+
+    def fake_get(requested_url, headers, timeout):
+        sent_headers.append(headers)
+        return responses.pop(0)
+
+    monkeypatch.setattr(helpers._SESSION, 'get', fake_get)
+    assert helpers.fetch_questions_from_url(url)[0] == [{"Question": "a"}]
+    assert helpers.fetch_questions_from_url(url)[0] == [{"Question": "b"}]
+    assert helpers.fetch_questions_from_url(url)[0] == [{"Question": "c"}]
+    assert sent_headers == [{}, {'If-None-Match': '"v1"'}, {}]
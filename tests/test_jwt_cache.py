@@ -0,0 +1,43 @@
+import pytest
+from flask import Flask
+from flask_jwt_extended import create_access_token, get_jwt_identity, verify_jwt_in_request
+from jwt.exceptions import InvalidSignatureError
+
+from app.jwt_cache import CachingJWTManager
+
+
+def _app(manager, secret):
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = secret
+    manager.init_app(app)
+    return app
+
+
+def _verify(app, token):
+    with app.test_request_context(headers={'Authorization': f'Bearer {token}'}):
+        verify_jwt_in_request()
+        return get_jwt_identity()
+
+
+def test_repeat_tokens_are_served_from_the_cache():
+    manager = CachingJWTManager()
+    app = _app(manager, 'a' * 32)
+    with app.app_context():
+        token = create_access_token(identity='alice')
+
+    assert _verify(app, token) == 'alice'
+    assert len(app.extensions['jwt_claims_cache']) == 1
+    assert _verify(app, token) == 'alice'
+
+
+def test_token_verified_by_one_app_is_not_trusted_by_another():
+    manager = CachingJWTManager()
+    first = _app(manager, 'a' * 32)
+    second = _app(manager, 'b' * 32)
+    with first.app_context():
+        token = create_access_token(identity='alice')
+
+    assert _verify(first, token) == 'alice'
+    with pytest.raises(InvalidSignatureError):
+        _verify(second, token)
+
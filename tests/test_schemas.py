@@ -0,0 +1,52 @@
+import pytest
+from pydantic import ValidationError
+
+from app.schemas import GroupingSchema, LoginSchema, SimilarityCheckSchema, validation_messages
+
+
+def _messages(schema, body):
+    with pytest.raises(ValidationError) as excinfo:
+        schema.model_validate_json(body)
+    return validation_messages(excinfo.value)
+
+
+def test_unknown_fields_are_rejected():
+    assert _messages(LoginSchema, b'{"username": "u", "pasword": "p"}') == {
+        'password': ["Missing data for required field."],
+        'pasword': ["Unknown field."],
+    }
+
+
+def test_grouping_rejects_unknown_fields():
+    body = (
+        b'{"questions_url": "https://example.com/q.json", "embedding_provider": "openai",'
+        b' "reasoning_provider": "openai", "short_circuit": true}'
+    )
+    assert _messages(GroupingSchema, body) == {'short_circuit': ["Unknown field."]}
+
+
+def test_field_messages_match_the_marshmallow_wording():
+    body = (
+        b'{"questions_url": "not a url", "question": 5, "embedding_provider": "deepseek",'
+        b' "reasoning_provider": null, "short_circuit": "maybe"}'
+    )
+    assert _messages(SimilarityCheckSchema, body) == {
+        'questions_url': ["Not a valid URL."],
+        'question': ["Not a valid string."],
+        'embedding_provider': ["Must be one of: gemini, openai."],
+        'reasoning_provider': ["Field may not be null."],
+        'short_circuit': ["Not a valid boolean."],
+    }
+
+
+@pytest.mark.parametrize("body", [b'[]', b'null', b'{not json'])
+def test_non_object_bodies_are_rejected(body):
+    assert _messages(LoginSchema, body) == {'_schema': ["Invalid input type."]}
+
+
+def test_valid_request():
+    data = SimilarityCheckSchema.model_validate_json(
+        b'{"questions_url": "https://example.com/q.json", "question": "q",'
+        b' "embedding_provider": "gemini", "reasoning_provider": "deepseek"}'
+    )
+    assert data.short_circuit is False